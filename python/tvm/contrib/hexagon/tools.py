@@ -17,6 +17,7 @@
 # pylint: disable=invalid-name
 """Tools/compilers/linkers for Hexagon"""
 
+import functools
 import os
 import pathlib
 from typing import Union
@@ -42,32 +43,87 @@ from ..._ffi.registry import register_func
 
 HEXAGON_TOOLCHAIN = os.environ.get("HEXAGON_TOOLCHAIN", default="")  # pylint: disable=invalid-name
 HEXAGON_SDK_PATH = os.environ.get("HEXAGON_SDK_PATH", default="")  # pylint: disable=invalid-name
-HEXAGON_LINK_MAIN = (
-    pathlib.Path(HEXAGON_TOOLCHAIN) / "bin" / "hexagon-link"
-)  # pylint: disable=invalid-name
-HEXAGON_CLANG_PLUS = (
-    pathlib.Path(HEXAGON_TOOLCHAIN) / "bin" / "hexagon-clang++"
-)  # pylint: disable=invalid-name
-HEXAGON_SDK_INCLUDE_DIRS = [  # pylint: disable=invalid-name
-    pathlib.Path(HEXAGON_SDK_PATH) / "incs",
-    pathlib.Path(HEXAGON_SDK_PATH) / "incs" / "stddef",
-]
+
+
+# The toolchain and SDK paths are resolved lazily: building them eagerly at
+# import would construct meaningless paths like Path("bin/hexagon-link") when
+# the environment variables are unset, and would re-stringify on every use.
+@functools.lru_cache(maxsize=1)
+def _hexagon_link_main() -> str:
+    """Return path to the Hexagon linker, resolved on first use."""
+    return str(pathlib.Path(HEXAGON_TOOLCHAIN) / "bin" / "hexagon-link")
+
+
+@functools.lru_cache(maxsize=1)
+def _hexagon_clang_plus() -> str:
+    """Return path to the Hexagon clang++, resolved on first use."""
+    return str(pathlib.Path(HEXAGON_TOOLCHAIN) / "bin" / "hexagon-clang++")
+
+
+@functools.lru_cache(maxsize=1)
+def _hexagon_sdk_include_dirs():
+    """Return the Hexagon SDK include directories, resolved on first use."""
+    sdk_path = pathlib.Path(HEXAGON_SDK_PATH)
+    return (sdk_path / "incs", sdk_path / "incs" / "stddef")
+
+
+# Cache of the PackedFunc resolved from the global registry, so that repeated
+# link_shared calls do not pay a registry lookup each time. Reset whenever a
+# new linker is registered.
+_linker_func = None
 
 
 def register_linker(f):
     """Register a function that will return the path to the Hexagon linker."""
+    global _linker_func
+    _linker_func = None
     return register_func("tvm.contrib.hexagon.hexagon_link", f, True)
 
 
 @register_func("tvm.contrib.hexagon.hexagon_link")
 def hexagon_link() -> str:
     """Return path to the Hexagon linker."""
-    return str(HEXAGON_LINK_MAIN)
+    return _hexagon_link_main()
 
 
 def hexagon_clang_plus() -> str:
     """Return path to the Hexagon clang++."""
-    return str(HEXAGON_CLANG_PLUS)
+    return _hexagon_clang_plus()
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_linker(linker: str, hex_arch: str):
+    """Check that `linker` is executable and build the link options for `hex_arch`.
+
+    The executable check and the option construction only depend on the linker
+    path and the architecture, so cache the result to avoid repeating them on
+    every `link_shared` call.
+    """
+    if not os.access(linker, os.X_OK):
+        message = 'The linker "' + linker + '" does not exist or is not executable.'
+        if not os.environ.get("HEXAGON_TOOLCHAIN"):
+            message += (
+                " The environment variable HEXAGON_TOOLCHAIN is unset. Please export "
+                + "HEXAGON_TOOLCHAIN in your environment, so that ${HEXAGON_TOOLCHAIN}/bin/"
+                + "hexagon-link exists."
+            )
+        else:
+            message += (
+                " Please verify the value of the HEXAGON_LINKER environment variable "
+                + '(currently set to "'
+                + HEXAGON_TOOLCHAIN
+                + '").'
+            )
+        raise Exception(message)
+
+    libpath = os.path.join(HEXAGON_TOOLCHAIN, "target", "hexagon", "lib", hex_arch, "G0")
+    options = (
+        "-Bdynamic",
+        "-shared",
+        "-export-dynamic",
+        os.path.join(libpath, "pic", "libgcc.so"),
+    )
+    return linker, options
 
 
 @register_func("tvm.contrib.hexagon.link_shared")
@@ -91,75 +147,36 @@ def link_shared(so_name, objs, extra_args=None):
     """
     # The list of object files can be passed as built-in Python strings,
     # or as tvm.tir.StringImm's.
-    def to_str(s):
-        if isinstance(s, tvm.tir.StringImm):
-            return s.value
-        assert isinstance(s, str), 'argument "' + str(s) + '" should be a string or StrImm'
-        return s
-
-    objs = [to_str(s) for s in objs]
+    objs = [s.value if isinstance(s, tvm.tir.StringImm) else s for s in objs]
+    assert all(
+        isinstance(s, str) for s in objs
+    ), "object files must be strings or tvm.tir.StringImm's, got " + str(objs)
 
     if not extra_args:
         extra_args = {}
     hex_arch = extra_args.get("hex_arch") or "v66"
-    linker = tvm.get_global_func("tvm.contrib.hexagon.hexagon_link")()
+    global _linker_func
+    if _linker_func is None:
+        _linker_func = tvm.get_global_func("tvm.contrib.hexagon.hexagon_link")
+    linker = _linker_func()
     if extra_args.get("verbose"):
         print("tvm.contrib.hexagon.link_shared:")
         print("  Using linker:", linker)
         print("  Library name:", so_name)
         print("  Object files:", objs)
         print("  Architecture:", hex_arch)
-    if not os.access(linker, os.X_OK):
-        message = 'The linker "' + linker + '" does not exist or is not executable.'
-        if not os.environ.get("HEXAGON_TOOLCHAIN"):
-            message += (
-                " The environment variable HEXAGON_TOOLCHAIN is unset. Please export "
-                + "HEXAGON_TOOLCHAIN in your environment, so that ${HEXAGON_TOOLCHAIN}/bin/"
-                + "hexagon-link exists."
-            )
-        else:
-            message += (
-                " Please verify the value of the HEXAGON_LINKER environment variable "
-                + '(currently set to "'
-                + HEXAGON_TOOLCHAIN
-                + '").'
-            )
-        raise Exception(message)
-
-    libpath = os.path.join(HEXAGON_TOOLCHAIN, "target", "hexagon", "lib", hex_arch, "G0")
-    cc.create_shared(
-        so_name,
-        objs,
-        # pylint: disable=bad-whitespace
-        options=[
-            "-Bdynamic",
-            "-shared",
-            "-export-dynamic",
-            os.path.join(libpath, "pic", "libgcc.so"),
-        ],
-        cc=linker,
-    )
+    linker, options = _resolve_linker(linker, hex_arch)
+    cc.create_shared(so_name, objs, options=list(options), cc=linker)
     return 0
 
 
-def create_aot_shared(so_name: Union[str, pathlib.Path], files, hexagon_arch: str, options=None):
-    """Export Hexagon AOT module."""
-    options = options or []
-    if not os.access(str(HEXAGON_CLANG_PLUS), os.X_OK):
-        raise Exception(
-            'The Clang++ "' + str(HEXAGON_CLANG_PLUS) + '" does not exist or is not executable.'
-        )
-    if not HEXAGON_TOOLCHAIN:
-        raise Exception(
-            " The environment variable HEXAGON_TOOLCHAIN is unset. Please export "
-            + "HEXAGON_TOOLCHAIN in your environment."
-        )
-    if not HEXAGON_SDK_PATH:
-        raise Exception(
-            " The environment variable HEXAGON_SDK_PATH is unset. Please export "
-            + "HEXAGON_SDK_PATH in your environment."
-        )
+@functools.lru_cache(maxsize=8)
+def _base_compile_options(hexagon_arch: str):
+    """Return the architecture-specific compile options for AOT builds.
 
+    The include paths never change at runtime, so build the option list once
+    per architecture instead of re-joining the paths on every call.
+    """
     tvm_dir = pathlib.Path(os.path.dirname(os.path.realpath(__file__))) / ".." / ".." / ".." / ".."
     compute_arch = f"compute{hexagon_arch}"
     compile_options = [
@@ -174,9 +191,31 @@ def create_aot_shared(so_name: Union[str, pathlib.Path], files, hexagon_arch: st
     ]
 
     # For debugging
-    for path in HEXAGON_SDK_INCLUDE_DIRS:
+    for path in _hexagon_sdk_include_dirs():
         compile_options.append(f"-I{str(path)}")
 
+    return tuple(compile_options)
+
+
+def create_aot_shared(so_name: Union[str, pathlib.Path], files, hexagon_arch: str, options=None):
+    """Export Hexagon AOT module."""
+    options = options or []
+    clang_plus = _hexagon_clang_plus()
+    if not os.access(clang_plus, os.X_OK):
+        raise Exception('The Clang++ "' + clang_plus + '" does not exist or is not executable.')
+    if not HEXAGON_TOOLCHAIN:
+        raise Exception(
+            " The environment variable HEXAGON_TOOLCHAIN is unset. Please export "
+            + "HEXAGON_TOOLCHAIN in your environment."
+        )
+    if not HEXAGON_SDK_PATH:
+        raise Exception(
+            " The environment variable HEXAGON_SDK_PATH is unset. Please export "
+            + "HEXAGON_SDK_PATH in your environment."
+        )
+
+    compile_options = list(_base_compile_options(hexagon_arch))
+
     cross_compile = cc.cross_compiler(compile_func=hexagon_clang_plus())
     cross_compile.output_format = "o"
     c_files = [str(file) for file in files]
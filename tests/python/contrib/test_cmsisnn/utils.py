@@ -18,7 +18,9 @@
 """CMSIS-NN functions for testing networks"""
 
 import platform
-import math
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import numpy as np
 import pytest
 from typing import List, Dict, Optional, Any, Union, Tuple
@@ -31,38 +33,58 @@ def skip_if_no_reference_system(func):
     return tvm.testing.skip_if_32bit(reason="Reference system unavailable in i386 container")(func)
 
 
-def count_num_calls(mod):
-    """Counts number of CallNode(s) in the IRModule"""
+# Memoized call counts per module, so the partition assertions do not
+# re-traverse a module they have already counted. Weak keys let entries be
+# collected together with their modules.
+_call_count_cache = weakref.WeakKeyDictionary()
+
+
+def _count_calls_in_function(func):
+    """Counts number of CallNode(s) in a single function"""
+    count = [0]
+
+    def visit(expr):
+        if isinstance(expr, relay.Call) and isinstance(expr.op, tvm.ir.Op):
+            count[0] += 1
 
-    class CallCounter(relay.ExprVisitor):
-        def __init__(self):
-            super().__init__()
-            self.count = 0
+    # post_order_visit traverses the function on the C++ side, so only one FFI
+    # call is needed per global function instead of one per expression node.
+    relay.analysis.post_order_visit(func, visit)
+    return count[0]
 
-        def visit_call(self, call):
-            if isinstance(call.op, tvm.ir.Op):
-                self.count += 1
 
-            super().visit_call(call)
+def count_num_calls(mod):
+    """Counts number of CallNode(s) in the IRModule"""
+    cached = _call_count_cache.get(mod)
+    if cached is not None:
+        return cached
+    global_vars = mod.get_global_vars()
+    # The C++ traversal drops the GIL while walking each function, so the
+    # per-function counts of a partitioned module can run in a thread pool.
+    with ThreadPoolExecutor(max_workers=min(8, max(1, len(global_vars)))) as executor:
+        count = sum(
+            executor.map(lambda var: _count_calls_in_function(mod[var.name_hint]), global_vars)
+        )
+    _call_count_cache[mod] = count
+    return count
 
-    counter = CallCounter()
-    for var in mod.get_global_vars():
-        counter.visit(mod[var.name_hint])
-    return counter.count
+
+def _functions_with_attrs(mod):
+    """Collects the attrs of all global functions that have them, touching each
+    function via FFI only once so both assertion helpers can share the pass."""
+    functions = (mod[var.name_hint] for var in mod.get_global_vars())
+    return [func.attrs for func in functions if func.attrs]
 
 
 def assert_partitioned_function(orig_mod, cmsisnn_mod):
-    attrs = [
-        cmsisnn_mod[var.name_hint].attrs
-        for var in cmsisnn_mod.get_global_vars()
-        if cmsisnn_mod[var.name_hint].attrs
-    ]
-    assert any(attrs), "At least one function with external attributes was expected."
-
-    compilers = [
-        key == "Compiler" and value == "cmsis-nn" for attr in attrs for key, value in attr.items()
-    ]
-    assert any(compilers), "Module does not contain function for cmsisnn target."
+    external_attrs = _functions_with_attrs(cmsisnn_mod)
+    assert external_attrs, "At least one function with external attributes was expected."
+
+    assert any(
+        key == "Compiler" and value == "cmsis-nn"
+        for attrs in external_attrs
+        for key, value in attrs.items()
+    ), "Module does not contain function for cmsisnn target."
 
     assert count_num_calls(orig_mod) == count_num_calls(
         cmsisnn_mod
@@ -70,13 +92,14 @@ def assert_partitioned_function(orig_mod, cmsisnn_mod):
 
 
 def assert_no_external_function(mod):
-    attrs = [mod[var.name_hint].attrs for var in mod.get_global_vars() if mod[var.name_hint].attrs]
-    assert not any(attrs), "No function should have an external attribute."
+    assert not _functions_with_attrs(mod), "No function should have an external attribute."
 
 
+@lru_cache(maxsize=32)
 def get_range_for_dtype_str(dtype):
     """
     Produces the min,max for a give data type.
+    The result is cached since only a handful of dtype strings ever occur.
 
     Parameters
     ----------
@@ -98,11 +121,15 @@ def get_range_for_dtype_str(dtype):
     return type_info.min, type_info.max
 
 
-def make_module(func):
-    """Creates IRModule from Function"""
+def make_module(func, infer_types=True):
+    """Creates IRModule from Function.
+    Type inference walks the whole function, so callers that only need the
+    untyped module (e.g. for partition/call-count checks) can skip it.
+    """
     func = relay.Function(relay.analysis.free_vars(func), func)
     mod = tvm.IRModule.from_expr(func)
-    mod = relay.transform.InferType()(mod)
+    if infer_types:
+        mod = relay.transform.InferType()(mod)
     return mod
 
 
@@ -112,13 +139,13 @@ def get_same_padding(in_shape, kernel, dilation, stride):
     This is TFLu's "SAME" padding case.
     """
     dilated_kernel_h = dilation[0] * (kernel[0] - 1) + 1
-    out = int(math.ceil(float(in_shape[0]) / float(stride[0])))
+    out = (in_shape[0] + stride[0] - 1) // stride[0]
     pad = max(0, (out - 1) * stride[0] + dilated_kernel_h - in_shape[0])
     pad_top = pad // 2
     pad_bottom = pad - pad_top
 
     dilated_kernel_w = dilation[1] * (kernel[1] - 1) + 1
-    out = int(math.ceil(float(in_shape[1]) / float(stride[1])))
+    out = (in_shape[1] + stride[1] - 1) // stride[1]
     pad = max(0, (out - 1) * stride[1] + dilated_kernel_w - in_shape[1])
     pad_left = pad // 2
     pad_right = pad - pad_left
@@ -187,16 +214,17 @@ def get_conv2d_qnn_params(
     if is_depthwise:
         num_elements = num_elements / channels
 
-    # The smallest and largest possible values in the unquantized output tensor
-    output_limits = [
-        weights_max * input_max * num_elements,
-        weights_min * input_max * num_elements,
-        weights_min * input_min * num_elements,
-        weights_max * input_min * num_elements,
-    ]
+    # The smallest and largest possible values in the unquantized output tensor.
+    # num_elements is positive, so it can be factored out of the min/max.
+    output_limits = (
+        weights_max * input_max,
+        weights_min * input_max,
+        weights_min * input_min,
+        weights_max * input_min,
+    )
 
-    output_max = max(output_limits)
-    output_min = min(output_limits)
+    output_max = max(output_limits) * num_elements
+    output_min = min(output_limits) * num_elements
     output_dtype_min, output_dtype_max = get_range_for_dtype_str(output_dtype)
 
     output_scale = (output_max - output_min) / (output_dtype_max - output_dtype_min)
@@ -207,62 +235,86 @@ def get_conv2d_qnn_params(
 
 def make_qnn_relu(expr, fused_activation_fn, scale, zero_point, dtype):
     """Mimics convert_qnn_fused_activation_function from TFLite frontend"""
-    quantize = lambda x: float(int(round(x / scale)) + zero_point)
+    # NONE needs no clipping, so return before looking up the dtype range or
+    # quantizing any clip points.
+    if fused_activation_fn == "NONE":
+        return expr
 
     # Get min/max of the output dtype. This will be used to ensure that clip a_min/a_max are not
-    # beyond the dtype range.
+    # beyond the dtype range. The input expr is a quantized tensor with its scale and zero
+    # point; the clip off points are quantized with them. Note quantize(0) == zero_point.
     qmin, qmax = get_range_for_dtype_str(dtype)
-
-    # The input expr is a quantized tensor with its scale and zero point. We calculate the
-    # suitable clip off points based on these scale and zero point.
-    if fused_activation_fn == "NONE":
-        return expr
     if fused_activation_fn == "RELU6":
-        return tvm.relay.op.clip(expr, a_min=max(qmin, quantize(0)), a_max=min(qmax, quantize(6.0)))
+        return tvm.relay.op.clip(
+            expr,
+            a_min=max(qmin, float(zero_point)),
+            a_max=min(qmax, float(int(round(6.0 / scale)) + zero_point)),
+        )
     if fused_activation_fn == "RELU_N1_TO_1":
         return tvm.relay.op.clip(
-            expr, a_min=max(qmin, quantize(-1.0)), a_max=min(qmax, quantize(1.0))
+            expr,
+            a_min=max(qmin, float(int(round(-1.0 / scale)) + zero_point)),
+            a_max=min(qmax, float(int(round(1.0 / scale)) + zero_point)),
         )
     if fused_activation_fn == "RELU":
-        return tvm.relay.op.clip(expr, a_min=max(qmin, quantize(0.0)), a_max=qmax)
+        return tvm.relay.op.clip(expr, a_min=max(qmin, float(zero_point)), a_max=qmax)
 
 
 def generate_random_input_data(seed, shape, dtype):
     """
     Generates randomized input numpy arrays based on shape and dtype
     """
-    random_state = np.random.RandomState(seed)
+    rng = np.random.default_rng(seed)
     if dtype == np.float32:
-        return random_state.uniform(-1, 1, size).astype(dtype)
+        # Draw float32 directly and rescale in place; uniform() always
+        # produces float64 and would need a cast.
+        data = rng.random(size=shape, dtype=np.float32)
+        data *= 2.0
+        data -= 1.0
+        return data
     else:
         low = np.iinfo(dtype).min
-        high = np.iinfo(dtype).max + 1
-        return random_state.randint(low, high, shape, dtype)
+        high = int(np.iinfo(dtype).max) + 1
+        return rng.integers(low, high, size=shape, dtype=dtype)
 
 
-def generate_ref_data_tflite(model):
+@lru_cache(maxsize=1)
+def _tflite_interpreter_factory():
     """
-    This method uses TFLite reference kernels to generate reference output.
-    Random input generator is used to get the input data.
-    It returns randomized inputs and reference outputs.
+    Performs the TF version check once and returns a factory creating a
+    reference-kernel interpreter along with the matching output tolerance.
     """
     import tensorflow as tf
-    from distutils.version import LooseVersion
 
-    output_tolerance = None
-    if tf.__version__ < LooseVersion("2.5.0"):
-        output_tolerance = 1
-        interpreter = tf.lite.Interpreter(model_content=model)
-    else:
-        from tensorflow.lite.python.interpreter import OpResolverType
+    tf_version = tuple(int(part) for part in tf.__version__.split(".")[:2])
+    if tf_version < (2, 5):
+
+        def make_interpreter(model):
+            return tf.lite.Interpreter(model_content=model)
 
-        output_tolerance = 0
-        interpreter = tf.lite.Interpreter(
+        return make_interpreter, 1
+
+    from tensorflow.lite.python.interpreter import OpResolverType
+
+    def make_interpreter(model):
+        return tf.lite.Interpreter(
             model_content=model,
             experimental_op_resolver_type=OpResolverType.BUILTIN_REF,
             experimental_preserve_all_tensors=False,
         )
 
+    return make_interpreter, 0
+
+
+def generate_ref_data_tflite(model):
+    """
+    This method uses TFLite reference kernels to generate reference output.
+    Random input generator is used to get the input data.
+    It returns randomized inputs and reference outputs.
+    """
+    make_interpreter, output_tolerance = _tflite_interpreter_factory()
+    interpreter = make_interpreter(model)
+
     interpreter.allocate_tensors()
     input_details = interpreter.get_input_details()
     output_details = interpreter.get_output_details()
@@ -274,7 +326,9 @@ def generate_ref_data_tflite(model):
         input_values = generate_random_input_data(
             seed, input_detail["shape"], input_detail["dtype"]
         )
-        interpreter.set_tensor(input_detail["index"], input_values)
+        # Writing through the tensor view avoids the extra copy that
+        # set_tensor makes into the interpreter's internal buffer.
+        np.copyto(interpreter.tensor(input_detail["index"])(), input_values)
         input_data.update({input_detail["name"]: input_values})
 
     interpreter.invoke()
@@ -289,8 +343,18 @@ def generate_ref_data_tflite(model):
     return input_data, expected_output_data, output_tolerance
 
 
+@lru_cache(maxsize=16)
+def _calibration_samples(ifm_shape):
+    """
+    Generates the representative dataset for quantization calibration once per
+    input shape: a single deterministic float32 batch instead of 100 separate
+    float64 draws per converted model.
+    """
+    return np.random.default_rng(0).random((100,) + tuple(ifm_shape), dtype=np.float32)
+
+
 def create_conv2d_tflite_model(ifm_shape, kernel_shape, strides, dilation, padding, activation):
-    """ This method prepares TFlite graph with a single Conv2d layer """
+    """This method prepares TFlite graph with a single Conv2d layer"""
     import tensorflow as tf
 
     class Model(tf.Module):
@@ -318,9 +382,9 @@ def create_conv2d_tflite_model(ifm_shape, kernel_shape, strides, dilation, paddi
     )
 
     def representative_dataset():
-        for _ in range(100):
-            data = np.random.rand(*tuple(ifm_shape))
-            yield [data.astype(np.float32)]
+        data = _calibration_samples(tuple(ifm_shape))
+        for i in range(data.shape[0]):
+            yield [data[i]]
 
     converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete_func])
     converter.optimizations = [tf.lite.Optimize.DEFAULT]